@@ -5,15 +5,17 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from PIL import Image
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import os
+import html
+import hashlib
+import requests
 
 # Import custom modules
-from src.emotion_detector import EmotionDetector
+from src.emotion_detector import EmotionDetector, NO_FACE_ERROR
 from src.recommender import ProductRecommender
-from src.utils import log_feedback, create_feedback_csv, load_image_safely
+from src.utils import FEEDBACK_PATH, log_feedback, create_feedback_csv, load_image_safely
 from src.integrations.spotify_utils import get_playlists_by_mood, is_spotify_available
 
 # Page configuration
@@ -25,7 +27,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+CSS = """
 <style>
     .main-header {
         font-size: 3rem;
@@ -92,7 +94,38 @@ st.markdown("""
         margin: 2rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource
+def _inject_css():
+    """Inject the static stylesheet; cached so Streamlit replays it rather than re-running it."""
+    st.markdown(CSS, unsafe_allow_html=True)
+
+@st.cache_data(ttl=86400)
+def _fetch_thumb(url):
+    """Download a thumbnail once; later reruns are served from the cache."""
+    response = requests.get(url, timeout=3)
+    response.raise_for_status()
+    return response.content
+
+@st.cache_data(ttl=300)
+def _thumb_or_none(url):
+    """Thumbnail bytes, or None if the download failed.
+
+    Failures are only remembered for this cache's short TTL, so a dead URL
+    costs at most one timeout per window, while successes stay in
+    _fetch_thumb for the day.
+    """
+    try:
+        return _fetch_thumb(url)
+    except requests.RequestException:
+        return None
+
+def _product_thumb(url):
+    """Cached image bytes for a product URL, or None if there is nothing to show."""
+    if not isinstance(url, str) or not url.startswith('http'):
+        return None
+    return _thumb_or_none(url)
 
 def display_playlists(playlists, emotion):
     """Display Spotify playlists in a nice format."""
@@ -102,48 +135,113 @@ def display_playlists(playlists, emotion):
     
     st.markdown(f"### 🎵 Playlists for your **{emotion.title()}** mood")
     
+    # Build every card into one HTML block so the list is a single element
+    # instead of a columns/image/markdown trio per playlist
+    parts = []
     for i, playlist in enumerate(playlists, 1):
-        col1, col2 = st.columns([1, 4])
-        
-        with col1:
-            if playlist.get('image'):
-                st.image(
-                    playlist['image'], 
-                    width=80,
-                    caption=f"#{i}"
-                )
-            else:
-                st.markdown(f"""
-                <div style="width: 80px; height: 80px; background: linear-gradient(135deg, #1db954, #191414); 
-                           border-radius: 8px; display: flex; align-items: center; justify-content: center; 
-                           color: white; font-size: 24px;">
-                    🎵
-                </div>
-                """, unsafe_allow_html=True)
+        if playlist.get('image'):
+            thumb = f"""
+            <img src="{html.escape(playlist['image'], quote=True)}" alt="#{i}" class="playlist-image">"""
+        else:
+            thumb = """
+            <div style="width: 80px; height: 80px; flex-shrink: 0; background: linear-gradient(135deg, #1db954, #191414); 
+                        border-radius: 8px; display: flex; align-items: center; justify-content: center; 
+                        color: white; font-size: 24px;">
+                🎵
+            </div>"""
         
-        with col2:
-            st.markdown(f"""
-            <div class="playlist-card">
-                <h4 style="margin: 0 0 0.5rem 0;">{playlist['name']}</h4>
+        parts.append(f"""
+        <div style="display: flex; align-items: center; gap: 1rem;">{thumb}
+            <div class="playlist-card" style="flex: 1;">
+                <h4 style="margin: 0 0 0.5rem 0;">{html.escape(playlist['name'])}</h4>
                 <p style="margin: 0 0 0.5rem 0; opacity: 0.8;">
-                    👤 {playlist.get('owner', 'Unknown')} • 
+                    👤 {html.escape(str(playlist.get('owner', 'Unknown')))} • 
                     🎵 {playlist.get('total_tracks', 0)} tracks
                 </p>
-                <a href="{playlist['url']}" target="_blank" 
+                <a href="{html.escape(playlist['url'], quote=True)}" target="_blank" 
                    style="color: #1db954; text-decoration: none; font-weight: bold;">
                     ▶️ Listen on Spotify
                 </a>
             </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown("---")
+        </div>""")
+    
+    st.markdown("\n".join(parts), unsafe_allow_html=True)
+
+@st.cache_resource
+def get_detector():
+    """Shared EmotionDetector so the DeepFace model is loaded once per process."""
+    return EmotionDetector()
+
+@st.cache_resource
+def get_recommender():
+    """Shared ProductRecommender so the catalog is loaded once per process."""
+    return ProductRecommender()
+
+class _DetectionFailed(Exception):
+    """Raised inside the cached detection so transient failures are never stored."""
+
+    def __init__(self, result):
+        super().__init__(result.get('error'))
+        self.result = result
+
+@st.cache_data(max_entries=64)
+def _detect_emotion(file_hash, _image):
+    """Emotion result per uploaded file; only `file_hash` is part of the cache key."""
+    result = get_detector().detect_emotion(_image)
+    # "No face detected" is a property of the image and safe to keep; any
+    # other failure may be transient, so let the next click retry it
+    if not result['success'] and result.get('error') != NO_FACE_ERROR:
+        raise _DetectionFailed(result)
+    return result
+
+def _cached_detection(file_hash, image):
+    """Cached emotion result for an upload, or the (uncached) failure result."""
+    try:
+        return _detect_emotion(file_hash, image)
+    except _DetectionFailed as e:
+        return e.result
+
+@st.cache_data(ttl=3600)
+def _cached_recs(emotion, n):
+    """Product recommendations per emotion, reused across reruns and sessions."""
+    return get_recommender().get_recommendations(emotion, n_recommendations=n)
+
+class _NoPlaylists(Exception):
+    """Raised inside the cached fetch so an empty result is never stored."""
+
+@st.cache_data(ttl=3600)
+def _fetch_playlists(emotion, n):
+    """Spotify playlists per emotion, so repeat moods skip the API round-trips."""
+    playlists = get_playlists_by_mood(emotion, n_playlists=n)
+    if not playlists:
+        # Usually an outage or rate limit; don't pin it for the whole TTL
+        raise _NoPlaylists(emotion)
+    return playlists
+
+def _cached_playlists(emotion, n):
+    """Cached playlists for an emotion, or [] (uncached) when none were found."""
+    try:
+        return _fetch_playlists(emotion, n)
+    except _NoPlaylists:
+        return []
+
+@st.cache_data(max_entries=1)
+def _emotion_distribution_chart(mtime):
+    """Build the sidebar emotion pie once per feedback file version (keyed by `mtime`)."""
+    feedback_df = pd.read_csv(FEEDBACK_PATH)
+    if feedback_df.empty or 'detected_emotion' not in feedback_df.columns:
+        return None
+    emotion_counts = feedback_df['detected_emotion'].value_counts()
+    fig = go.Figure(go.Pie(values=emotion_counts.values,
+                           labels=emotion_counts.index.tolist()))
+    fig.update_layout(title="Emotion Distribution")
+    return fig
 
 def main():
+    _inject_css()
+    get_detector()  # Load the shared model before the first analysis
+
     # Initialize session state
-    if 'detector' not in st.session_state:
-        st.session_state.detector = EmotionDetector()
-    if 'recommender' not in st.session_state:
-        st.session_state.recommender = ProductRecommender()
     if 'analyzed_emotion' not in st.session_state:
         st.session_state.analyzed_emotion = None
     if 'recommendations' not in st.session_state:
@@ -169,14 +267,10 @@ def main():
         st.header("📊 Analytics")
         
         # Show emotion distribution if feedback exists
-        if os.path.exists('data/feedback.csv'):
+        if os.path.exists(FEEDBACK_PATH):
             try:
-                feedback_df = pd.read_csv('data/feedback.csv')
-                if not feedback_df.empty and 'detected_emotion' in feedback_df.columns:
-                    emotion_counts = feedback_df['detected_emotion'].value_counts()
-                    fig = px.pie(values=emotion_counts.values, 
-                               names=emotion_counts.index,
-                               title="Emotion Distribution")
+                fig = _emotion_distribution_chart(os.path.getmtime(FEEDBACK_PATH))
+                if fig is not None:
                     st.plotly_chart(fig, use_container_width=True)
             except Exception as e:
                 st.write("No analytics available yet")
@@ -211,6 +305,7 @@ def main():
         if uploaded_file is not None:
             # Display uploaded image
             image = load_image_safely(uploaded_file)
+            file_hash = hashlib.blake2b(uploaded_file.getvalue(), digest_size=8).hexdigest()
             if image is not None:
                 st.image(image, caption="Uploaded Image", use_column_width=True)
                 
@@ -218,8 +313,16 @@ def main():
                 if st.button("🔍 Analyze Emotion", type="primary"):
                     with st.spinner("Analyzing your emotion..."):
                         try:
-                            result = st.session_state.detector.detect_emotion(image)
+                            # Same upload as last time: reuse the stored result,
+                            # but let a failed analysis be retried
+                            last_result = st.session_state.analyzed_emotion
+                            if (st.session_state.get('last_hash') == file_hash and
+                                last_result is not None and last_result['success']):
+                                result = last_result
+                            else:
+                                result = _cached_detection(file_hash, image)
                             st.session_state.analyzed_emotion = result
+                            st.session_state.last_hash = file_hash
                             
                             if result and result['success']:
                                 emotion = result['emotion']
@@ -236,16 +339,14 @@ def main():
                                 # Get recommendations and playlists
                                 if confidence >= confidence_threshold:
                                     # Get product recommendations
-                                    recommendations = st.session_state.recommender.get_recommendations(
-                                        emotion, n_recommendations=5
-                                    )
+                                    recommendations = _cached_recs(emotion, 5)
                                     st.session_state.recommendations = recommendations
                                     
                                     # Get Spotify playlists
                                     if spotify_available:
                                         with st.spinner("Finding matching playlists..."):
                                             try:
-                                                playlists = get_playlists_by_mood(emotion, n_playlists=5)
+                                                playlists = _cached_playlists(emotion, 5)
                                                 st.session_state.playlists = playlists
                                             except Exception as e:
                                                 st.error(f"Error getting playlists: {str(e)}")
@@ -262,18 +363,17 @@ def main():
         
         if st.session_state.recommendations is not None and not st.session_state.recommendations.empty:
             # Display recommendations
-            for idx, product in st.session_state.recommendations.iterrows():
+            products = st.session_state.recommendations.to_dict('records')
+            thumbs = [_product_thumb(product['image_url']) for product in products]
+            for product, thumb in zip(products, thumbs):
                 with st.container():
                     col_img, col_info = st.columns([1, 2])
                     
                     with col_img:
-                        if pd.notna(product['image_url']) and product['image_url'].startswith('http'):
-                            try:
-                                st.image(product['image_url'], width=100)
-                            except:
-                                st.write("🖼️ Image not available")
+                        if thumb is not None:
+                            st.image(thumb, width=100)
                         else:
-                            st.write("🖼️ No image")
+                            st.write("🖼️ Image not available")
                     
                     with col_info:
                         st.markdown(f"""
@@ -4,16 +4,27 @@
 import cv2
 import numpy as np
 from PIL import Image
-import tempfile
-import os
 import time
 
+# Error reported when the detector finds no face; it depends only on the image
+NO_FACE_ERROR = "No face detected"
+
+def _features(gray):
+    """Return (brightness, contrast) of a grayscale image in a single pass."""
+    mean, stddev = cv2.meanStdDev(gray)
+    return float(mean[0, 0]), float(stddev[0, 0])
+
 class EmotionDetector:
     """    Emotion detection using DeepFace library with fallback mechanisms."""
     
+    # Longest side (px) of the image handed to DeepFace
+    MAX_ANALYSIS_SIZE = 640
+    
     def __init__(self):
         self.deepface_available = self._check_deepface()
-    
+        if self.deepface_available:
+            self._preload_models()
+
     def _check_deepface(self):
         """Check if DeepFace is available and working."""
         try:
@@ -26,6 +37,32 @@ class EmotionDetector:
             print(f"Error initializing DeepFace: {e}")
             return False
     
+    def _preload_models(self):
+        """Build the DeepFace emotion model and face detector now instead of on the first analyze() call."""
+        try:
+            from deepface import DeepFace
+            try:
+                DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+                legacy_api = False
+            except TypeError:
+                # Older DeepFace releases: build_model(name)
+                DeepFace.build_model("Emotion")
+                legacy_api = True
+        except Exception as e:
+            print(f"Error preloading DeepFace models: {e}")
+            return
+
+        # The detector warm-up is separate so a failure here never costs the
+        # emotion model that was already built
+        try:
+            if legacy_api:
+                from deepface.detectors import FaceDetector
+                FaceDetector.build_model("opencv")
+            else:
+                DeepFace.build_model(task="face_detector", model_name="opencv")
+        except Exception as e:
+            print(f"Error preloading DeepFace face detector: {e}")
+
     def detect_emotion(self, image):
         """
         Detect emotion from image using DeepFace or fallback method.
@@ -43,6 +80,13 @@ class EmotionDetector:
             }
         """
         try:
+            # Shrink PIL images before either backend turns them into arrays;
+            # copy first so the caller's full-size image is left for display
+            if isinstance(image, Image.Image):
+                image = image.copy()
+                image.thumbnail((self.MAX_ANALYSIS_SIZE, self.MAX_ANALYSIS_SIZE),
+                                Image.Resampling.BILINEAR)
+
             if self.deepface_available:
                 return self._detect_with_deepface(image)
             else:
@@ -57,6 +101,7 @@ class EmotionDetector:
             }
     
     def _detect_with_deepface(self, image):
+        """Detect emotion using DeepFace library."""
         try:
             from deepface import DeepFace
 
@@ -72,36 +117,48 @@ class EmotionDetector:
             else:
                 image_bgr = image_array
 
-            # Create temp file path manually and close immediately
-            tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-            tmp_path = tmp_file.name
-            tmp_file.close()  # Release file lock
-
-            # Write image to temp path
-            cv2.imwrite(tmp_path, image_bgr)
+            # Downscale large uploads; the emotion model only sees a 48x48 face crop
+            h, w = image_bgr.shape[:2]
+            scale = self.MAX_ANALYSIS_SIZE / max(h, w)
+            if scale < 1:
+                image_bgr = cv2.resize(image_bgr, None, fx=scale, fy=scale,
+                                       interpolation=cv2.INTER_AREA)
 
+            # DeepFace accepts a BGR array directly, no temp file needed.
+            # enforce_detection makes it bail out before running the emotion
+            # model when the detector finds no face.
             try:
                 result = DeepFace.analyze(
-                    img_path=tmp_path,
+                    img_path=image_bgr,
                     actions=['emotion'],
-                    enforce_detection=False,
+                    enforce_detection=True,
                     detector_backend='opencv'
                 )
-            finally:
-                os.unlink(tmp_path)  # Clean up temp file
+            except ValueError:
+                return {
+                    'success': False,
+                    'emotion': None,
+                    'confidence': 0.0,
+                    'all_emotions': {},
+                    'error': NO_FACE_ERROR
+                }
 
             if isinstance(result, list):
                 result = result[0]
 
             emotions = result['emotion']
             dominant_emotion = result['dominant_emotion']
-            confidence = emotions[dominant_emotion] / 100.0
+
+            # Rescale percentages to [0, 1] in one vectorized op
+            labels = list(emotions)
+            scores = np.fromiter(emotions.values(), dtype=np.float64, count=len(labels)) / 100.0
+            confidence = float(scores[labels.index(dominant_emotion)])
 
             return {
                 'success': True,
                 'emotion': dominant_emotion,
                 'confidence': confidence,
-                'all_emotions': {k: v / 100.0 for k, v in emotions.items()},
+                'all_emotions': dict(zip(labels, scores.tolist())),
                 'error': None
             }
 
@@ -113,62 +170,6 @@ class EmotionDetector:
                 'all_emotions': {},
                 'error': f"DeepFace error: {str(e)}"
             }
-
-        """Detect emotion using DeepFace library."""
-        try:
-            from deepface import DeepFace
-            
-            # Convert PIL Image to numpy array if needed
-            if isinstance(image, Image.Image):
-                image_array = np.array(image)
-            else:
-                image_array = image
-            
-            # Save image temporarily for DeepFace
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
-                if len(image_array.shape) == 3:
-                    # RGB to BGR for OpenCV
-                    image_bgr = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
-                else:
-                    image_bgr = image_array
-                
-                cv2.imwrite(tmp.name, image_bgr)
-                
-                # Analyze emotion
-                result = DeepFace.analyze(
-                    img_path=tmp.name,
-                    actions=['emotion'],
-                    enforce_detection=False,
-                    detector_backend='opencv'
-                )
-                
-                # Clean up temp file
-                os.unlink(tmp.name)
-                
-                # Extract results
-                if isinstance(result, list):
-                    result = result[0]
-                
-                emotions = result['emotion']
-                dominant_emotion = result['dominant_emotion']
-                confidence = emotions[dominant_emotion] / 100.0
-                
-                return {
-                    'success': True,
-                    'emotion': dominant_emotion,
-                    'confidence': confidence,
-                    'all_emotions': {k: v/100.0 for k, v in emotions.items()},
-                    'error': None
-                }
-                
-        except Exception as e:
-            return {
-                'success': False,
-                'emotion': None,
-                'confidence': 0.0,
-                'all_emotions': {},
-                'error': f"DeepFace error: {str(e)}"
-            }
     
     def _fallback_detection(self, image):
         """
@@ -178,16 +179,16 @@ class EmotionDetector:
         try:
             # Convert to grayscale for basic analysis
             if isinstance(image, Image.Image):
-                gray = np.array(image.convert('L'))
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                image = np.asarray(image)
+            if len(image.shape) == 3:
+                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
             else:
-                if len(image.shape) == 3:
-                    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-                else:
-                    gray = image
-            
+                gray = image
+
             # Simple heuristic: use image brightness and contrast
-            brightness = np.mean(gray)
-            contrast = np.std(gray)
+            brightness, contrast = _features(gray)
             
             # Map brightness and contrast to emotions (very basic)
             if brightness > 150:
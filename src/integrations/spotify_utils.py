@@ -2,9 +2,16 @@
 # src/integrations/spotify_utils.py - Spotify Integration Module
 # ============================================================================
 import os
+import sys
+import time
 import logging
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, List, Dict, Optional, Tuple
+import requests
 import spotipy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from spotipy.oauth2 import SpotifyClientCredentials
 from dotenv import load_dotenv
 
@@ -15,14 +22,55 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Rate-limit (HTTP 429) handling for search calls
+MAX_RATE_LIMIT_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+# Total sleep allowed per search; searches run on the Streamlit script thread
+MAX_TOTAL_BACKOFF_SECONDS = 10
+
+class _TTLCache:
+    """Small thread-safe in-process cache whose entries expire after `ttl` seconds."""
+    
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: Dict[Tuple, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Return the cached value for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+    
+    def set(self, key: Tuple, value: Any) -> None:
+        """Store `value`, evicting the oldest entry when the cache is full."""
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+
 class SpotifyMoodRecommender:
     """Spotify integration for mood-based playlist recommendations."""
     
     def __init__(self):
         """Initialize Spotify client with credentials from environment variables."""
         self.client = None
+        self._session = None
+        self._probed = False
         self._initialize_client()
         
+        # Search results per (query, limit) and final picks per (mood, n)
+        self._search_cache = _TTLCache(maxsize=256, ttl=300)
+        self._mood_cache = _TTLCache(maxsize=256, ttl=300)
+        
         # Mood to search terms mapping
         self.mood_keywords = {
             'happy': ['happy', 'upbeat', 'positive', 'cheerful', 'joyful'],
@@ -36,6 +84,15 @@ class SpotifyMoodRecommender:
             'relaxed': ['chill', 'lounge', 'ambient', 'relaxing', 'calm'],
             'romantic': ['love', 'romantic', 'valentine', 'date night', 'intimate']
         }
+        
+        # Ready-made search queries per mood; only the first 3 terms are used
+        # to avoid too many API calls. Keys are interned lowercase strings so
+        # already-normalized moods hit the dict without any string work.
+        self._mood_queries = {
+            sys.intern(mood.lower()): self._build_queries(terms)
+            for mood, terms in self.mood_keywords.items()
+        }
+        self._default_queries = self._build_queries(['music', 'playlist', 'songs'])
     
     def _initialize_client(self) -> None:
         """Initialize Spotify client with error handling."""
@@ -48,34 +105,114 @@ class SpotifyMoodRecommender:
                 logger.error("Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET in your .env file")
                 return
             
+            # One long-lived session so TCP/TLS connections are pooled and
+            # reused across searches (and across the token refresh)
+            self._session = self._build_session()
+            
             # Set up client credentials flow
             client_credentials_manager = SpotifyClientCredentials(
                 client_id=client_id,
-                client_secret=client_secret
+                client_secret=client_secret,
+                requests_session=self._session
             )
             
             self.client = spotipy.Spotify(
                 client_credentials_manager=client_credentials_manager,
-                requests_timeout=10
+                requests_timeout=10,
+                requests_session=self._session
             )
             
-            # Test connection
-            self.client.search(q='test', limit=1)
+            # The connection is verified lazily by is_available()
             logger.info("Spotify client initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize Spotify client: {str(e)}")
             self.client = None
     
-    def _get_search_terms(self, mood: str) -> List[str]:
-        """Get search terms for a given mood."""
-        mood_lower = mood.lower().strip()
-        return self.mood_keywords.get(mood_lower, ['music', 'playlist', 'songs'])
+    @staticmethod
+    def _build_session() -> requests.Session:
+        """Create a pooled HTTP session that retries transient server errors."""
+        # 429 is deliberately not retried here: spotipy then raises a
+        # SpotifyException that carries the response headers, and
+        # _search_with_backoff applies the capped Retry-After backoff.
+        # Retry-After is ignored for 5xx so urllib3 never sleeps unbounded.
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[500, 502, 503, 504],
+            respect_retry_after_header=False
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        return session
+    
+    def close(self) -> None:
+        """Release pooled connections held by the HTTP session."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+    
+    def __del__(self):
+        self.close()
     
-    def _search_playlists(self, search_term: str, limit: int = 10) -> List[Dict]:
-        """Search for playlists using a specific term."""
+    @staticmethod
+    def _build_queries(terms: List[str]) -> Tuple[str, ...]:
+        """Turn mood keywords into playlist search queries."""
+        return tuple(f"{term} playlist" for term in terms[:3])
+    
+    def _normalize_mood(self, mood: str) -> str:
+        """Lowercase/strip a mood, skipping the string ops for known moods."""
+        if mood in self._mood_queries:
+            return mood
+        return mood.lower().strip()
+    
+    def _get_search_queries(self, mood: str) -> Tuple[str, ...]:
+        """Get search queries for a given mood."""
+        return self._mood_queries.get(self._normalize_mood(mood), self._default_queries)
+    
+    def _search_with_backoff(self, **params) -> Dict:
+        """Run a search, sleeping and retrying when Spotify answers 429.
+
+        Gives up once the next wait would push the total sleep past
+        MAX_TOTAL_BACKOFF_SECONDS.
+        """
+        waited = 0.0
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            try:
+                return self.client.search(**params)
+            except spotipy.SpotifyException as e:
+                # Only real 429 responses carry headers; spotipy reports the
+                # session's exhausted 5xx retries as a 429 with empty headers
+                headers = getattr(e, 'headers', None)
+                if e.http_status != 429 or not headers or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = BACKOFF_BASE_SECONDS * 2 ** attempt
+                retry_after = headers.get('Retry-After')
+                if retry_after:
+                    try:
+                        delay = float(retry_after)
+                    except ValueError:
+                        pass
+                if waited + delay > MAX_TOTAL_BACKOFF_SECONDS:
+                    raise
+                waited += delay
+                logger.warning(f"Spotify rate limit hit, retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def _search_playlists(self, search_term: str, limit: int = 10,
+                          stop_after: Optional[int] = None) -> Optional[List[Dict]]:
+        """Search for playlists using a specific term, parsing at most `stop_after` items.
+
+        Returns None (and caches nothing) if the search itself failed.
+        """
+        cache_key = (search_term, limit, stop_after)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
-            results = self.client.search(
+            results = self._search_with_backoff(
                 q=search_term,
                 type='playlist',
                 limit=limit,
@@ -84,27 +221,33 @@ class SpotifyMoodRecommender:
             
             playlists = []
             for playlist in results['playlists']['items']:
-                if playlist and playlist.get('name') and playlist.get('external_urls'):
-                    playlist_data = {
-                        'name': playlist['name'],
-                        'url': playlist['external_urls']['spotify'],
-                        'image': None,
-                        'description': playlist.get('description', ''),
-                        'total_tracks': playlist.get('tracks', {}).get('total', 0),
-                        'owner': playlist.get('owner', {}).get('display_name', 'Unknown')
-                    }
-                    
-                    # Get image URL
-                    if playlist.get('images') and len(playlist['images']) > 0:
-                        playlist_data['image'] = playlist['images'][0]['url']
-                    
-                    playlists.append(playlist_data)
+                if stop_after is not None and len(playlists) >= stop_after:
+                    break
+                if not playlist:
+                    continue
+                # Look each field up once
+                name = playlist.get('name')
+                urls = playlist.get('external_urls')
+                if not (name and urls):
+                    continue
+                images = playlist.get('images')
+                
+                playlists.append({
+                    'name': name,
+                    'url': urls['spotify'],
+                    'image': images[0]['url'] if images else None,
+                    'description': playlist.get('description', ''),
+                    'total_tracks': (playlist.get('tracks') or {}).get('total', 0),
+                    'owner': (playlist.get('owner') or {}).get('display_name', 'Unknown'),
+                    '_name_key': name.lower()  # Dedup key, stripped before returning
+                })
             
+            self._search_cache.set(cache_key, tuple(playlists))
             return playlists
             
         except Exception as e:
             logger.error(f"Error searching playlists for '{search_term}': {str(e)}")
-            return []
+            return None
     
     def get_playlists_by_mood(self, mood: str, n_playlists: int = 5) -> List[Dict]:
         """
@@ -125,35 +268,68 @@ class SpotifyMoodRecommender:
             logger.warning("No mood provided. Using 'music' as default search term.")
             mood = 'music'
         
+        cache_key = (self._normalize_mood(mood), n_playlists)
+        cached = self._mood_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
-            search_terms = self._get_search_terms(mood)
+            queries = self._get_search_queries(mood)
             all_playlists = []
+            search_failed = False
             
-            # Search using different terms to get variety
-            for term in search_terms[:3]:  # Use first 3 terms to avoid too many API calls
-                playlists = self._search_playlists(f"{term} playlist", limit=10)
-                all_playlists.extend(playlists)
-                
-                if len(all_playlists) >= n_playlists * 2:  # Get extra to filter duplicates
-                    break
+            target = n_playlists * 2  # Get extra to filter duplicates
+            
+            # The first query usually yields enough on its own, so run it
+            # alone. Only if it comes back short are the remaining terms
+            # searched, concurrently since the requests are network-bound;
+            # stop waiting once there are enough candidates.
+            result = self._search_playlists(queries[0], 10, target)
+            if result is None:
+                search_failed = True
+            else:
+                all_playlists.extend(result)
+            
+            if len(all_playlists) < target and len(queries) > 1:
+                executor = ThreadPoolExecutor(max_workers=len(queries) - 1)
+                try:
+                    # Each follow-up only has to cover the shortfall, so parsing
+                    # stops well before the 10 items a page returns
+                    needed = target - len(all_playlists)
+                    futures = [executor.submit(self._search_playlists, query, 10, needed) for query in queries[1:]]
+                    for future in as_completed(futures):
+                        result = future.result()
+                        if result is None:
+                            search_failed = True
+                            continue
+                        all_playlists.extend(result)
+                        
+                        if len(all_playlists) >= target:
+                            break
+                finally:
+                    executor.shutdown(wait=False, cancel_futures=True)
             
             # Remove duplicates and filter by quality
             seen_names = set()
             unique_playlists = []
             
             for playlist in all_playlists:
-                name_lower = playlist['name'].lower()
-                if (name_lower not in seen_names and 
+                name_key = playlist['_name_key']
+                if (name_key not in seen_names and 
                     len(playlist['name']) > 3 and  # Filter out very short names
                     playlist['total_tracks'] > 10):  # Filter out small playlists
                     
-                    seen_names.add(name_lower)
-                    unique_playlists.append(playlist)
+                    seen_names.add(name_key)
+                    # Copy without the dedup key; the source dict lives in the search cache
+                    unique_playlists.append({k: v for k, v in playlist.items() if k != '_name_key'})
                     
                     if len(unique_playlists) >= n_playlists:
                         break
             
             logger.info(f"Found {len(unique_playlists)} playlists for mood: {mood}")
+            # Don't pin a partial or empty answer from a failed search
+            if unique_playlists and not search_failed:
+                self._mood_cache.set(cache_key, tuple(unique_playlists[:n_playlists]))
             return unique_playlists[:n_playlists]
             
         except Exception as e:
@@ -162,6 +338,14 @@ class SpotifyMoodRecommender:
     
     def is_available(self) -> bool:
         """Check if Spotify client is available and working."""
+        if self.client is not None and not self._probed:
+            # Verify credentials once, on first use rather than at construction
+            self._probed = True
+            try:
+                self.client.search(q='test', limit=1)
+            except Exception as e:
+                logger.error(f"Failed to connect to Spotify: {str(e)}")
+                self.client = None
         return self.client is not None
 
 
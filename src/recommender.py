@@ -1,19 +1,29 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 import logging
 
+from src.utils import PRODUCT_COLUMNS, PRODUCT_DTYPES
+
 logging.basicConfig(level=logging.INFO)
 
 class ProductRecommender:
     def __init__(self, products_csv_path='data/products.csv'):
         self.products_csv_path = products_csv_path
         self.products_df = None
+        self._tag_matrix = None
+        self._tag_counts = None
+        self._emotion_vectors = {}
+        self._name_lower = None
+        self._mood_tags_lower = None
+        self._rng = np.random.default_rng()
+        self._pending_rows = []
         self.emotion_mapping = self._create_emotion_mapping()
         self.load_products()
 
     def _create_emotion_mapping(self):
-        return {
+        mapping = {
             'happy': ['entertainment', 'social', 'celebration', 'joy', 'fun', 'colorful'],
             'sad': ['comfort', 'cozy', 'self-care', 'healing', 'soft', 'warm'],
             'angry': ['stress-relief', 'physical', 'intense', 'powerful', 'bold'],
@@ -22,20 +32,29 @@ class ProductRecommender:
             'disgust': ['cleansing', 'fresh', 'pure', 'minimal', 'detox'],
             'neutral': ['practical', 'everyday', 'basic', 'functional', 'versatile']
         }
+        # Interned keys so lookups with the detector's emotion labels are cheap
+        return {sys.intern(emotion): tags for emotion, tags in mapping.items()}
 
     def load_products(self):
         try:
             if os.path.exists(self.products_csv_path):
-                self.products_df = pd.read_csv(self.products_csv_path)
+                self.products_df = pd.read_csv(
+                    self.products_csv_path,
+                    usecols=lambda col: col in PRODUCT_COLUMNS,
+                    dtype=PRODUCT_DTYPES
+                )
+                self._index_products()
                 logging.info(f"Loaded {len(self.products_df)} products")
             else:
                 logging.warning("Products CSV not found. Creating sample data.")
                 self._create_sample_products()
         except Exception as e:
+            # Fall back to sample data in memory only; an unreadable catalog
+            # on disk must not be overwritten
             logging.error(f"Error loading products: {e}")
-            self._create_sample_products()
+            self._create_sample_products(save=False)
 
-    def _create_sample_products(self):
+    def _create_sample_products(self, save=True):
         sample_products = [
             {'product_id': 1, 'name': 'Wireless Bluetooth Headphones', 'price': 99.99,
              'image_url': 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=300',
@@ -46,27 +65,59 @@ class ProductRecommender:
             # ... (rest of sample products unchanged)
         ]
         self.products_df = pd.DataFrame(sample_products)
+        self._index_products()
+        if not save:
+            return
         os.makedirs('data', exist_ok=True)
         self.products_df.to_csv(self.products_csv_path, index=False)
         logging.info(f"Created sample products CSV at {self.products_csv_path}")
 
+    def _index_products(self):
+        """Parse and lowercase product names and mood tags once so scoring and search don't redo it per call."""
+        mood_tags = self.products_df['mood_tags']
+        self._name_lower = self.products_df['name'].str.lower()
+        self._mood_tags_lower = mood_tags.str.lower()
+        product_tag_sets = (
+            mood_tags.astype(str).str.lower().str.strip()
+            .str.split(r'\s*,\s*', regex=True)
+            .map(frozenset)
+            .tolist()
+        )
+
+        # Binary product x tag matrix plus one query vector per emotion, so
+        # Jaccard scoring for the whole catalog is a single matrix-vector product.
+        # Only emotion tags can intersect a query, so the matrix covers just
+        # that small vocabulary; each product's full tag count goes in the union.
+        emotion_sets = {emotion: frozenset(tags) for emotion, tags in self.emotion_mapping.items()}
+        vocab = {tag: i for i, tag in enumerate(frozenset().union(*emotion_sets.values()))}
+        self._tag_matrix = np.zeros((len(product_tag_sets), len(vocab)), dtype=np.float32)
+        rows = [i for i, tags in enumerate(product_tag_sets) for tag in tags if tag in vocab]
+        cols = [vocab[tag] for tags in product_tag_sets for tag in tags if tag in vocab]
+        self._tag_matrix[rows, cols] = 1
+        self._tag_counts = np.fromiter(map(len, product_tag_sets), dtype=np.float32,
+                                       count=len(product_tag_sets))
+        self._emotion_vectors = {}
+        for emotion, tags in emotion_sets.items():
+            q = np.zeros(len(vocab), dtype=np.float32)
+            q[[vocab[tag] for tag in tags]] = 1
+            self._emotion_vectors[emotion] = q
+
     def get_recommendations(self, emotion, n_recommendations=5):
         if self.products_df is None or self.products_df.empty:
             return pd.DataFrame()
-        emotion = emotion.lower()
+        if emotion not in self.emotion_mapping:
+            emotion = emotion.lower()
         if emotion not in self.emotion_mapping:
             return self.products_df.sample(n=min(n_recommendations, len(self.products_df)))
-        emotion_tags = self.emotion_mapping[emotion]
-        scores = []
-        for _, product in self.products_df.iterrows():
-            product_tags = [tag.strip() for tag in str(product['mood_tags']).lower().split(',')]
-            intersection = set(emotion_tags) & set(product_tags)
-            score = len(intersection) / len(set(emotion_tags) | set(product_tags))
-            score += np.random.uniform(-0.1, 0.1)
-            scores.append(score)
-        products_with_scores = self.products_df.copy()
-        products_with_scores['relevance_score'] = scores
-        return products_with_scores.sort_values('relevance_score', ascending=False).head(n_recommendations).drop('relevance_score', axis=1)
+        q = self._emotion_vectors[emotion]
+        inter = self._tag_matrix @ q
+        union = self._tag_counts + q.sum() - inter
+        scores = inter / np.maximum(union, 1) + self._rng.uniform(-0.1, 0.1, len(inter))
+        # Partial top-k selection, then order just those k rows by score
+        k = min(n_recommendations, len(scores))
+        top_idx = np.argpartition(-scores, k - 1)[:k]
+        top_idx = top_idx[np.argsort(-scores[top_idx])]
+        return self.products_df.iloc[top_idx].reset_index(drop=True)
 
     def get_product_by_id(self, product_id):
         if self.products_df is None:
@@ -74,11 +125,47 @@ class ProductRecommender:
         result = self.products_df[self.products_df['product_id'] == product_id]
         return result.iloc[0] if not result.empty else None
 
-    def add_product(self, product_data):
-        if self.products_df is None:
-            self.products_df = pd.DataFrame()
-        self.products_df = pd.concat([self.products_df, pd.DataFrame([product_data])], ignore_index=True)
-        self.products_df.to_csv(self.products_csv_path, index=False)
+    def add_product(self, product_data, flush=True):
+        """
+        Add a product dict, or a list of them.
+
+        With flush=False the rows are only queued; call flush() to merge all
+        queued rows into the catalog and CSV in one go.
+        """
+        if isinstance(product_data, dict):
+            self._pending_rows.append(product_data)
+        else:
+            self._pending_rows.extend(product_data)
+        if flush:
+            self.flush()
+
+    def add_products(self, products):
+        """Add many products with a single concat and a single CSV append."""
+        self.add_product(list(products))
+
+    def flush(self):
+        """Merge queued products into the catalog and append them to the CSV."""
+        if not self._pending_rows:
+            return
+        new_rows = pd.DataFrame(self._pending_rows)
+        current = self.products_df if self.products_df is not None else pd.DataFrame()
+        products_df = pd.concat([current, new_rows], ignore_index=True)
+        # Append only the new rows instead of rewriting the whole catalog,
+        # lined up with the file's own header (which may have extra columns
+        # that aren't loaded into memory)
+        write_header = not os.path.exists(self.products_csv_path) or os.path.getsize(self.products_csv_path) == 0
+        if write_header:
+            columns = products_df.columns
+        else:
+            columns = pd.read_csv(self.products_csv_path, nrows=0).columns
+        new_rows.reindex(columns=columns).to_csv(
+            self.products_csv_path, mode='a', header=write_header, index=False
+        )
+        # Only drop the queue once the rows are on disk, so a failed append
+        # can be retried without losing or duplicating them
+        self._pending_rows = []
+        self.products_df = products_df
+        self._index_products()
 
     def get_all_products(self):
         """Return all products as a DataFrame."""
@@ -90,7 +177,7 @@ class ProductRecommender:
             return pd.DataFrame()
         query = query.lower()
         mask = (
-            self.products_df['name'].str.lower().str.contains(query, na=False) |
-            self.products_df['mood_tags'].str.lower().str.contains(query, na=False)
+            self._name_lower.str.contains(query, na=False, regex=False) |
+            self._mood_tags_lower.str.contains(query, na=False, regex=False)
         )
         return self.products_df[mask]
@@ -1,3 +1,6 @@
+import bisect
+import csv
+import math
 import pandas as pd
 import numpy as np
 from PIL import Image
@@ -7,12 +10,20 @@ import logging
 
 logging.basicConfig(level=logging.INFO)
 
+# Only these columns are loaded from products.csv; price gets a compact dtype.
+# product_id is left to inference so non-integer ids don't fail the whole read.
+PRODUCT_COLUMNS = ['product_id', 'name', 'price', 'image_url', 'mood_tags']
+PRODUCT_DTYPES = {'price': 'float32'}
+
+FEEDBACK_PATH = 'data/feedback.csv'
+FEEDBACK_COLUMNS = ['timestamp', 'detected_emotion', 'confidence', 'rating', 'feedback_text', 'num_recommendations']
+
 def load_products(path="data/products.csv"):
     if not os.path.exists(path):
         logging.warning(f"Products file not found at {path}")
         return pd.DataFrame()
     try:
-        df = pd.read_csv(path)
+        df = pd.read_csv(path, usecols=lambda col: col in PRODUCT_COLUMNS, dtype=PRODUCT_DTYPES)
         required_columns = ["product_id", "name", "price", "mood_tags"]
         if not all(col in df.columns for col in required_columns):
             logging.error("Missing required columns in products.csv")
@@ -24,38 +35,38 @@ def load_products(path="data/products.csv"):
 
 def load_image_safely(uploaded_file):
     try:
+        # Decode straight from the upload stream, no intermediate byte copy
+        if hasattr(uploaded_file, 'seek'):
+            uploaded_file.seek(0)
         image = Image.open(uploaded_file)
+        # convert() already returns a new image and load() detaches the pixels
+        # from the stream, so no extra full-size copy is needed
         if image.mode != 'RGB':
-            image = image.convert('RGB')
-        return image.copy()
+            return image.convert('RGB')
+        image.load()
+        return image
     except Exception as e:
         logging.error(f"Error loading image: {e}")
         return None
 
 def create_feedback_csv():
-    feedback_path = 'data/feedback.csv'
     os.makedirs('data', exist_ok=True)
-    if not os.path.exists(feedback_path):
-        columns = ['timestamp', 'detected_emotion', 'confidence', 'rating', 'feedback_text', 'num_recommendations']
-        pd.DataFrame(columns=columns).to_csv(feedback_path, index=False)
-        logging.info(f"Created feedback CSV at {feedback_path}")
+    if not os.path.exists(FEEDBACK_PATH) or os.path.getsize(FEEDBACK_PATH) == 0:
+        with open(FEEDBACK_PATH, 'w', newline='') as f:
+            csv.writer(f).writerow(FEEDBACK_COLUMNS)
+        logging.info(f"Created feedback CSV at {FEEDBACK_PATH}")
 
 def log_feedback(emotion, confidence, rating, feedback_text="", num_recommendations=0):
-    feedback_path = 'data/feedback.csv'
-    new_feedback = {
-        'timestamp': datetime.now().isoformat(),
-        'detected_emotion': emotion,
-        'confidence': confidence,
-        'rating': rating,
-        'feedback_text': feedback_text,
-        'num_recommendations': num_recommendations
-    }
-    try:
-        df = pd.read_csv(feedback_path)
-    except (FileNotFoundError, pd.errors.EmptyDataError):
-        df = pd.DataFrame()
-    df = pd.concat([df, pd.DataFrame([new_feedback])], ignore_index=True)
-    df.to_csv(feedback_path, index=False)
+    # Append a single row rather than rewriting the whole log; the header is
+    # only needed when the file is new or empty
+    with open(FEEDBACK_PATH, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if f.tell() == 0:
+            writer.writerow(FEEDBACK_COLUMNS)
+        writer.writerow([
+            datetime.now().isoformat(), emotion, confidence,
+            rating, feedback_text, num_recommendations
+        ])
     logging.info(f"Logged feedback: {emotion} - Rating: {rating}")
 
 def resize_image(image, max_size=(800, 600)):
@@ -81,18 +92,23 @@ def clean_mood_tags(tags):
     except Exception:
         return "No tags available"
 
+_CONF_THRESHOLDS = (0.3, 0.5, 0.7, 0.9)
+_CONF_LABELS = ("Very Low", "Low", "Medium", "High", "Very High")
+
+_EMOJI = {
+    'happy': '😊', 'sad': '😢', 'angry': '😠',
+    'surprise': '😲', 'fear': '😨', 'disgust': '🤢', 'neutral': '😐'
+}
+
 def calculate_emotion_confidence_level(confidence):
-    if confidence >= 0.9: return "Very High"
-    elif confidence >= 0.7: return "High"
-    elif confidence >= 0.5: return "Medium"
-    elif confidence >= 0.3: return "Low"
-    else: return "Very Low"
+    # NaN compares false against every threshold, which bisect would turn
+    # into the top label; infinities already land on the right end
+    if math.isnan(confidence):
+        return _CONF_LABELS[0]
+    return _CONF_LABELS[bisect.bisect_right(_CONF_THRESHOLDS, confidence)]
 
 def get_emotion_emoji(emotion):
-    return {
-        'happy': '😊', 'sad': '😢', 'angry': '😠',
-        'surprise': '😲', 'fear': '😨', 'disgust': '🤢', 'neutral': '😐'
-    }.get(emotion.lower(), '🤔')
+    return _EMOJI.get(emotion.lower(), '🤔')
 
 def validate_product_data(product_data):
     required_fields = ['product_id', 'name', 'price', 'mood_tags']
@@ -107,10 +123,9 @@ def validate_product_data(product_data):
     return True, "Valid"
 
 def export_feedback_summary():
-    feedback_path = 'data/feedback.csv'
-    if not os.path.exists(feedback_path): return None
+    if not os.path.exists(FEEDBACK_PATH): return None
     try:
-        df = pd.read_csv(feedback_path)
+        df = pd.read_csv(FEEDBACK_PATH)
         if df.empty: return None
         return {
             'total_feedback': len(df),